@@ -1,5 +1,6 @@
+import pandas as pd
 import streamlit as st
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, FrozenSet, List, Tuple, Optional
 
 INITIAL_GROUPS: Dict[str, List[str]] = {
     "A": ["Mexico", "South Africa", "South Korea", "UEFA D (DEN/MKD/CZE/IRL)"],
@@ -16,7 +17,11 @@ INITIAL_GROUPS: Dict[str, List[str]] = {
     "L": ["England", "Croatia", "Ghana", "Panama"],
 }
 
-GROUP_NAMES = sorted(list(INITIAL_GROUPS.keys()))
+GROUP_NAMES: Tuple[str, ...] = tuple(sorted(INITIAL_GROUPS))
+GROUP_INDEX: Dict[str, int] = {g: i for i, g in enumerate(GROUP_NAMES)}
+
+# rows follow GROUP_NAMES, columns are positions 1st..4th
+StandingsTable = Tuple[Tuple[Optional[str], ...], ...]
 
 # =============================================================
 # UTILITY FUNCTIONS
@@ -29,47 +34,53 @@ def ordinal(n: int) -> str:
     return f"{n}{suffix}"
 
 
+# group positions only ever go from 1 to 4
+ORDINALS: Dict[int, str] = {n: ordinal(n) for n in range(1, 5)}
+
+
 def validate_permutation(choices: List[str], empty: str = "-") -> bool:
-    if empty in choices:
-        return False
-    return len(choices) == len(set(choices))
+    seen = set()
+    for c in choices:
+        if c == empty or c in seen:
+            return False
+        seen.add(c)
+    return True
 
 
 def build_group_classification(
     groups: Dict[str, List[str]]
 ) -> Tuple[Dict[str, List[str]], List[str]]:
     """
-    Render group standings UI (1st–4th place) for all groups.
-    Inside each group, once a team is selected for a position,
-    it is removed from the options of the remaining positions.
+    Render group standings UI (1st–4th place) for all groups
+    as a single editable table, one column per group.
+    Each column only offers the teams of its own group.
     """
     standings: Dict[str, List[str]] = {}
     errors: List[str] = []
 
     st.header("1. Group Stage Standings")
 
-    for g in GROUP_NAMES:
-        teams = groups[g]
-        st.subheader(f"Group {g}")
-        cols = st.columns(4)
-        pos_choices: List[str] = []
-
-        for i in range(4):
-            pos_num = i + 1
-            already_chosen = [c for c in pos_choices if c != "-"]
-            available_teams = [t for t in teams if t not in already_chosen]
-            options = ["-"] + available_teams
-
-            key = f"group_{g}_pos_{pos_num}"
-
-            with cols[i]:
-                choice = st.selectbox(
-                    f"{ordinal(pos_num)} place",
-                    options=options,
-                    key=key,
-                )
-            pos_choices.append(choice)
+    columns = [f"Group {g}" for g in GROUP_NAMES]
+    table = pd.DataFrame(
+        [["-"] * len(columns) for _ in range(4)],
+        index=[f"{ORDINALS[n]} place" for n in range(1, 5)],
+        columns=columns,
+    )
+    column_config = {
+        f"Group {g}": st.column_config.SelectboxColumn(
+            f"Group {g}", options=["-"] + groups[g], required=True
+        )
+        for g in GROUP_NAMES
+    }
+    edited = st.data_editor(
+        table,
+        key="group_standings",
+        column_config=column_config,
+        use_container_width=True,
+    )
 
+    for g in GROUP_NAMES:
+        pos_choices = edited[f"Group {g}"].tolist()
         if validate_permutation(pos_choices):
             standings[g] = pos_choices
         else:
@@ -103,16 +114,18 @@ def pick_top8_third_places_ui(terceiros: List[Tuple[str, str]]):
         return [], errors
 
     selected: List[Tuple[str, str]] = []
+    count = 0
 
     for g, team in terceiros:
         label = f"{g} – {team}"
         checked = st.checkbox(label, key=f"third_{g}")
         if checked:
             selected.append((g, team))
+            count += 1
 
-    if len(selected) != 8:
+    if count != 8:
         errors.append(
-            f"You must select exactly 8 third-placed teams (currently selected: {len(selected)})."
+            f"You must select exactly 8 third-placed teams (currently selected: {count})."
         )
 
     return selected, errors
@@ -146,77 +159,140 @@ ROUND32_THIRD_SLOTS = {
 }
 
 
-def get_team(code: str, standings: Dict[str, List[str]]) -> Optional[str]:
+def parse_code(code: str) -> Tuple[int, int]:
     """
-    Convert codes like 1A, 2B, 3C into team names based on group standings.
+    Convert codes like 1A, 2B, 3C into (row, column) of the standings table.
     """
-    if len(code) != 2:
-        return None
-    pos, group = code[0], code[1]
-    if group not in standings or len(standings[group]) != 4:
-        return None
-    idx = {"1": 0, "2": 1, "3": 2, "4": 3}.get(pos)
-    if idx is None:
-        return None
-    return standings[group][idx]
+    return GROUP_INDEX[code[1]], int(code[0]) - 1
 
 
-def distribute_third_places(
-    qualified: List[Tuple[str, str]],
-) -> Tuple[Optional[Dict[str, Tuple[str, str]]], Optional[str]]:
-    """
-    Assign the 8 qualified 3rd-placed teams to matches M74, M77, M79, M80, M81, M82, M85, M87,
-    respecting allowed groups for each match.
+# the same rules decoded once into standings table indices
+# fixed: match_id -> ((row1, col1), (row2, col2), "2A vs 2B")
+ROUND32_FIXED_IDX: Dict[str, Tuple[Tuple[int, int], Tuple[int, int], str]] = {
+    mid: (parse_code(code1), parse_code(code2), f"{code1} vs {code2}")
+    for mid, (code1, code2) in ROUND32_FIXED.items()
+}
+# third-place slots: match_id -> ((row, col) of the host, "1E")
+ROUND32_THIRD_HOST_IDX: Dict[str, Tuple[Tuple[int, int], str]] = {
+    mid: (parse_code(code1), code1) for mid, (code1, _) in ROUND32_THIRD_SLOTS.items()
+}
+
+ROUND32_THIRD_MATCH_IDS: Tuple[str, ...] = tuple(ROUND32_THIRD_SLOTS)
 
-    Uses backtracking to guarantee we find a valid assignment if one exists.
+ROUND32_THIRD_ALLOWED: Dict[str, FrozenSet[str]] = {
+    mid: frozenset(groups) for mid, (_, groups) in ROUND32_THIRD_SLOTS.items()
+}
+
+# group -> bitmask of third-place slots it can fill (bit i = ROUND32_THIRD_MATCH_IDS[i])
+GROUP_TO_MATCHMASK: Dict[str, int] = {
+    g: sum(
+        1 << i
+        for i, mid in enumerate(ROUND32_THIRD_MATCH_IDS)
+        if g in ROUND32_THIRD_ALLOWED[mid]
+    )
+    for g in GROUP_NAMES
+}
+
+
+def standings_key(standings: Dict[str, List[str]]) -> Tuple[Tuple[str, ...], ...]:
     """
-    match_ids = list(ROUND32_THIRD_SLOTS.keys())  # 8 matches
-    if len(qualified) != 8:
-        return None, "Exactly 8 third-placed teams must be qualified."
+    Group standings as tuples in GROUP_NAMES order, usable as a session-state key.
+    """
+    return tuple(tuple(standings.get(g, ())) for g in GROUP_NAMES)
 
-    assignment: Dict[str, Tuple[str, str]] = {}  # match_id -> (group, team)
 
-    def backtrack(i: int, used_matches: set) -> bool:
-        if i == len(qualified):
-            return True
+def build_standings_table(key: Tuple[Tuple[str, ...], ...]) -> StandingsTable:
+    """
+    Arrange group standings (as returned by standings_key) as a 12x4 table:
+    row GROUP_INDEX[g], column pos - 1.
+    Groups that are not fully defined get a row of None.
+    """
+    return tuple(row if len(row) == 4 else (None,) * 4 for row in key)
 
-        group, team = qualified[i]
 
-        for mid in match_ids:
-            if mid in used_matches:
-                continue
+def get_standings_table(key: Tuple[Tuple[str, ...], ...]) -> StandingsTable:
+    """
+    Same as build_standings_table, but kept in session state and only rebuilt
+    when the standings change between reruns.
+    """
+    if st.session_state.get("standings_table_key") != key:
+        st.session_state["standings_table"] = build_standings_table(key)
+        st.session_state["standings_table_key"] = key
+    return st.session_state["standings_table"]
 
-            _, allowed_groups = ROUND32_THIRD_SLOTS[mid]
-            if group not in allowed_groups:
-                continue
 
-            # choose
-            assignment[mid] = (group, team)
-            used_matches.add(mid)
+def _solve_thirds(team_masks: List[int]) -> Optional[List[int]]:
+    """
+    Pure integer core of distribute_third_places.
+    team_masks[t] has bit i set if team t may play in the i-th third-place slot.
+    Returns the slot index chosen for each team, or None if no assignment exists.
+    """
+    if not team_masks:
+        return []
+
+    n = len(team_masks)
+    pending = [0] * n  # team -> candidate slot bits not tried yet
+    taken = [0] * n  # team -> slot bit currently assigned
+    used = 0
+    i = 0
+    pending[0] = team_masks[0]
+
+    while 0 <= i < n:
+        cand = pending[i]
+        if not cand:
+            # every slot failed for this team: undo the previous choice
+            i -= 1
+            if i >= 0:
+                used ^= taken[i]
+            continue
+        bit = cand & -cand
+        pending[i] = cand ^ bit
+        taken[i] = bit
+        used |= bit
+        i += 1
+        if i < n:
+            pending[i] = team_masks[i] & ~used
+
+    if i < 0:
+        return None
+
+    return [bit.bit_length() - 1 for bit in taken]
 
-            if backtrack(i + 1, used_matches):
-                return True
 
-            # undo
-            used_matches.remove(mid)
-            del assignment[mid]
+@st.cache_data(max_entries=64)
+def distribute_third_places(
+    qualified: List[Tuple[str, str]],
+) -> Tuple[Optional[Dict[str, Tuple[str, str]]], Optional[str]]:
+    """
+    Assign the 8 qualified 3rd-placed teams to matches M74, M77, M79, M80, M81, M82, M85, M87,
+    respecting allowed groups for each match.
 
-        return False
+    Uses iterative bitmask backtracking over the match slots to guarantee we find
+    a valid assignment if one exists.
+    """
+    if len(qualified) != 8:
+        return None, "Exactly 8 third-placed teams must be qualified."
 
-    if not backtrack(0, set()):
+    # bit i set -> team may play in ROUND32_THIRD_MATCH_IDS[i]
+    slots = _solve_thirds([GROUP_TO_MATCHMASK.get(g, 0) for g, _ in qualified])
+    if slots is None:
         return None, "Unable to assign the selected third-placed teams to the Round of 32."
 
-    return assignment, None
+    return {ROUND32_THIRD_MATCH_IDS[m]: qualified[t] for t, m in enumerate(slots)}, None
 
 
+@st.cache_data(max_entries=64)
 def build_round32(
-    standings: Dict[str, List[str]],
+    table: StandingsTable,
     qualified_thirds: List[Tuple[str, str]],
 ):
     """
     Build dict:
       match_id -> (team1, team2, textual_description)
-    for matches M73..M88.
+    for matches M73..M88, given the table from get_standings_table.
+
+    Cached across reruns, since the inputs only change when the user
+    edits the group stage or the third-place selection.
     """
     jogos_terceiros, err = distribute_third_places(qualified_thirds)
     if err:
@@ -225,14 +301,12 @@ def build_round32(
     jogos = {}
 
     # fixed games (no 3rd-placed teams)
-    for mid, (code1, code2) in ROUND32_FIXED.items():
-        t1 = get_team(code1, standings)
-        t2 = get_team(code2, standings)
-        jogos[mid] = (t1, t2, f"{code1} vs {code2}")
+    for mid, ((g1, p1), (g2, p2), desc) in ROUND32_FIXED_IDX.items():
+        jogos[mid] = (table[g1][p1], table[g2][p2], desc)
 
     # games with 3rd-placed teams
-    for mid, (code1, _) in ROUND32_THIRD_SLOTS.items():
-        t1 = get_team(code1, standings)
+    for mid, ((g1, p1), code1) in ROUND32_THIRD_HOST_IDX.items():
+        t1 = table[g1][p1]
         group_3, team_3 = jogos_terceiros[mid]
         code2 = f"3{group_3}"
         jogos[mid] = (t1, team_3, f"{code1} vs {code2}")
@@ -243,28 +317,29 @@ def build_round32(
 # =============================================================
 # BRACKET STRUCTURE
 # =============================================================
-ROUND16_MATCHES = {
-    "M89": ("M74", "M77"),
-    "M90": ("M73", "M75"),
-    "M91": ("M76", "M78"),
-    "M92": ("M79", "M80"),
-    "M93": ("M83", "M84"),
-    "M94": ("M81", "M82"),
-    "M95": ("M86", "M88"),
-    "M96": ("M85", "M87"),
-}
+# each entry: (match_id, match whose winner is team 1, match whose winner is team 2)
+ROUND16_MATCHES: Tuple[Tuple[str, str, str], ...] = (
+    ("M89", "M74", "M77"),
+    ("M90", "M73", "M75"),
+    ("M91", "M76", "M78"),
+    ("M92", "M79", "M80"),
+    ("M93", "M83", "M84"),
+    ("M94", "M81", "M82"),
+    ("M95", "M86", "M88"),
+    ("M96", "M85", "M87"),
+)
 
-QUARTERS_MATCHES = {
-    "M97": ("M89", "M90"),
-    "M98": ("M93", "M94"),
-    "M99": ("M91", "M92"),
-    "M100": ("M95", "M96"),
-}
+QUARTERS_MATCHES: Tuple[Tuple[str, str, str], ...] = (
+    ("M97", "M89", "M90"),
+    ("M98", "M93", "M94"),
+    ("M99", "M91", "M92"),
+    ("M100", "M95", "M96"),
+)
 
-SEMIS_MATCHES = {
-    "M101": ("M97", "M98"),
-    "M102": ("M99", "M100"),
-}
+SEMIS_MATCHES: Tuple[Tuple[str, str, str], ...] = (
+    ("M101", "M97", "M98"),
+    ("M102", "M99", "M100"),
+)
 
 
 def choose_winner_ui(match_id: str, t1: Optional[str], t2: Optional[str]) -> Optional[str]:
@@ -321,7 +396,16 @@ if errors_thirds:
 # -------------------------------------------------------------
 # ROUND OF 32
 # -------------------------------------------------------------
-jogos_r32, err = build_round32(standings, qualified_thirds)
+# reuse the previous bracket when nothing upstream changed (e.g. only a
+# knockout winner was picked), skipping even the cache_data hashing
+table_key = standings_key(standings)
+r32_key = (table_key, tuple(qualified_thirds))
+if st.session_state.get("r32_key") == r32_key and "r32_cache" in st.session_state:
+    jogos_r32, err = st.session_state["r32_cache"]
+else:
+    jogos_r32, err = build_round32(get_standings_table(table_key), qualified_thirds)
+    st.session_state["r32_key"] = r32_key
+    st.session_state["r32_cache"] = (jogos_r32, err)
 if err:
     st.error("❌ Error generating Round of 32:")
     st.write(err)
@@ -342,8 +426,7 @@ for i, mid in enumerate(order32):
     col = cols32[i % 4]
     with col:
         t1, t2, desc = jogos_r32[mid]
-        st.markdown(f"**{mid} – {desc}**")
-        st.write(f"{t1} vs {t2}")
+        st.markdown(f"**{mid} – {desc}**  \n{t1} vs {t2}")
         winners32[mid] = choose_winner_ui(mid, t1, t2)
 
 # -------------------------------------------------------------
@@ -353,7 +436,7 @@ st.header("4. Round of 16")
 cols16 = st.columns(4)
 winners16: Dict[str, Optional[str]] = {}
 
-for i, (mid, (m1, m2)) in enumerate(ROUND16_MATCHES.items()):
+for i, (mid, m1, m2) in enumerate(ROUND16_MATCHES):
     col = cols16[i % 4]
     with col:
         t1 = winners32.get(m1)
@@ -368,7 +451,7 @@ st.header("5. Quarterfinals")
 colsQ = st.columns(4)
 winnersQ: Dict[str, Optional[str]] = {}
 
-for i, (mid, (m1, m2)) in enumerate(QUARTERS_MATCHES.items()):
+for i, (mid, m1, m2) in enumerate(QUARTERS_MATCHES):
     col = colsQ[i % 4]
     with col:
         t1 = winners16.get(m1)
@@ -383,7 +466,7 @@ st.header("6. Semifinals")
 colsS = st.columns(2)
 winnersS: Dict[str, Optional[str]] = {}
 
-for i, (mid, (m1, m2)) in enumerate(SEMIS_MATCHES.items()):
+for i, (mid, m1, m2) in enumerate(SEMIS_MATCHES):
     col = colsS[i % 2]
     with col:
         t1 = winnersQ.get(m1)
@@ -401,17 +484,16 @@ col3, colF = st.columns(2)
 with col3:
     st.subheader("Third Place Match")
 
-    sf1_m1, sf1_m2 = SEMIS_MATCHES["M101"]  # ("M97", "M98")
+    (sf1, sf1_m1, sf1_m2), (sf2, sf2_m1, sf2_m2) = SEMIS_MATCHES
     sf1_t1 = winnersQ.get(sf1_m1)
     sf1_t2 = winnersQ.get(sf1_m2)
-    sf1_winner = winnersS.get("M101")
+    sf1_winner = winnersS.get(sf1)
 
-    sf2_m1, sf2_m2 = SEMIS_MATCHES["M102"]  # ("M99", "M100")
     sf2_t1 = winnersQ.get(sf2_m1)
     sf2_t2 = winnersQ.get(sf2_m2)
-    sf2_winner = winnersS.get("M102")
+    sf2_winner = winnersS.get(sf2)
 
-    if all([sf1_t1, sf1_t2, sf1_winner, sf2_t1, sf2_t2, sf2_winner]):
+    if sf1_t1 and sf1_t2 and sf1_winner and sf2_t1 and sf2_t2 and sf2_winner:
         sf1_loser = sf1_t2 if sf1_winner == sf1_t1 else sf1_t1
         sf2_loser = sf2_t2 if sf2_winner == sf2_t1 else sf2_t1
 
@@ -427,8 +509,8 @@ with col3:
 # Final: winners of the semifinals
 with colF:
     st.subheader("Final")
-    tf1 = winnersS.get("M101")
-    tf2 = winnersS.get("M102")
+    tf1 = winnersS.get(sf1)
+    tf2 = winnersS.get(sf2)
     champion = choose_winner_ui("M104 (Final)", tf1, tf2)
     if champion:
         st.success(f"🏆 World Cup 2026 Champion: **{champion}**")